@@ -0,0 +1,20 @@
+"""Ahead-of-time compile the indicator kernels into the stock_kernels extension.
+
+Run once at build time, e.g. in the Docker image build:
+
+    python build_kernels.py
+
+The dashboard imports stock_kernels when it is present, so a cold start doesn't
+pay numba's JIT compile; without it the JIT kernels in indicators.py are used.
+"""
+from numba.pycc import CC
+
+from indicators import _advance
+
+cc = CC("stock_kernels")
+
+# state, closes, rsi_period, macd_fast, macd_slow, macd_signal, bb_window, bb_dev
+cc.export("advance", "UniTuple(f4[:], 5)(f8[:], f4[:], i8, i8, i8, i8, i8, f8)")(_advance.py_func)
+
+if __name__ == "__main__":
+    cc.compile()
@@ -0,0 +1,183 @@
+import numpy as np
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+    # Run the kernels as plain Python when numba isn't installed
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+# Layout of the float64 state vector carried between calls, so a series can be
+# extended bar by bar without recomputing from the start. Closes and outputs are
+# float32, but all running sums and EMAs accumulate in float64 through this vector.
+_N = 0  # bars consumed so far
+_PREV_CLOSE = 1
+_AVG_GAIN = 2
+_AVG_LOSS = 3
+_EMA_FAST = 4
+_EMA_SLOW = 5
+_EMA_SIGN = 6
+_BB_SHIFT = 7
+_BB_SUM = 8
+_BB_SUMSQ = 9
+_BB_RING = 10  # last `window` shifted closes, as a ring buffer
+
+
+def new_state(bb_window):
+    return np.zeros(_BB_RING + bb_window)
+
+
+# Wilder's RSI: gain/loss EMAs with alpha=1/period, seeded at zero like ta's RSIIndicator
+@njit(cache=True)
+def _rsi_loop(close, period, state, start):
+    n = close.shape[0]
+    rsi = np.full(n, np.nan, dtype=np.float32)
+    alpha = 1.0 / period
+    prev = state[_PREV_CLOSE]
+    avg_gain = state[_AVG_GAIN]
+    avg_loss = state[_AVG_LOSS]
+    for j in range(n):
+        i = start + j
+        # Widen on read: without numba a float32 scalar would keep prev/avgs in float32
+        x = float(close[j])
+        if i > 0:
+            diff = x - prev
+            gain = diff if diff > 0.0 else 0.0
+            loss = -diff if diff < 0.0 else 0.0
+            avg_gain += alpha * (gain - avg_gain)
+            avg_loss += alpha * (loss - avg_loss)
+        prev = x
+        if i >= period - 1:
+            if avg_loss == 0.0:
+                rsi[j] = 100.0
+            else:
+                rsi[j] = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    state[_PREV_CLOSE] = prev
+    state[_AVG_GAIN] = avg_gain
+    state[_AVG_LOSS] = avg_loss
+    return rsi
+
+
+# MACD line and signal line from three EWM recurrences (span-based alpha, adjust=False)
+@njit(cache=True)
+def _macd_loop(close, fast, slow, sign, state, start):
+    n = close.shape[0]
+    macd = np.full(n, np.nan, dtype=np.float32)
+    signal = np.full(n, np.nan, dtype=np.float32)
+    alpha_fast = 2.0 / (fast + 1)
+    alpha_slow = 2.0 / (slow + 1)
+    alpha_sign = 2.0 / (sign + 1)
+    first = max(fast, slow) - 1
+    ema_fast = state[_EMA_FAST]
+    ema_slow = state[_EMA_SLOW]
+    ema_sign = state[_EMA_SIGN]
+    for j in range(n):
+        i = start + j
+        x = float(close[j])
+        if i == 0:
+            ema_fast = x
+            ema_slow = x
+        else:
+            ema_fast += alpha_fast * (x - ema_fast)
+            ema_slow += alpha_slow * (x - ema_slow)
+        if i < first:
+            continue
+        m = ema_fast - ema_slow
+        macd[j] = m
+        if i == first:
+            ema_sign = m
+        else:
+            ema_sign += alpha_sign * (m - ema_sign)
+        if i >= first + sign - 1:
+            signal[j] = ema_sign
+    state[_EMA_FAST] = ema_fast
+    state[_EMA_SLOW] = ema_slow
+    state[_EMA_SIGN] = ema_sign
+    return macd, signal
+
+
+# Bollinger bands from a sliding running sum / sum of squares (population std).
+# Values are shifted by the first close so the sums stay small and the variance
+# doesn't lose precision to cancellation.
+@njit(cache=True)
+def _bb_loop(close, window, dev, state, start):
+    n = close.shape[0]
+    high = np.full(n, np.nan, dtype=np.float32)
+    low = np.full(n, np.nan, dtype=np.float32)
+    if start == 0 and n > 0:
+        state[_BB_SHIFT] = close[0]
+    shift = state[_BB_SHIFT]
+    s = state[_BB_SUM]
+    s2 = state[_BB_SUMSQ]
+    for j in range(n):
+        i = start + j
+        slot = _BB_RING + i % window
+        x = close[j] - shift
+        if i >= window:
+            y = state[slot]
+            s -= y
+            s2 -= y * y
+        state[slot] = x
+        s += x
+        s2 += x * x
+        if i >= window - 1:
+            mean = s / window
+            var = s2 / window - mean * mean
+            std = np.sqrt(var) if var > 0.0 else 0.0
+            high[j] = shift + mean + dev * std
+            low[j] = shift + mean - dev * std
+    state[_BB_SUM] = s
+    state[_BB_SUMSQ] = s2
+    return high, low
+
+
+# Vectorized Bollinger bands for when numba is missing: window sums via np.convolve
+# over the new closes plus the previous window-1 closes kept in the ring buffer.
+# Leaves the state exactly as _bb_loop would.
+def _bb_convolve(close, window, dev, state, start):
+    n = close.shape[0]
+    high = np.full(n, np.nan, dtype=np.float32)
+    low = np.full(n, np.nan, dtype=np.float32)
+    if n == 0:
+        return high, low
+    if start == 0:
+        state[_BB_SHIFT] = close[0]
+    shift = state[_BB_SHIFT]
+    k = min(start, window - 1)
+    prev = state[_BB_RING + np.arange(start - k, start) % window]
+    x = np.concatenate((prev, close - shift))
+    if x.shape[0] >= window:
+        ones = np.ones(window)
+        mean = np.convolve(x, ones, mode="valid") / window
+        var = np.convolve(x * x, ones, mode="valid") / window - mean * mean
+        std = np.sqrt(np.maximum(var, 0.0))
+        high[n - mean.shape[0]:] = shift + mean + dev * std
+        low[n - mean.shape[0]:] = shift + mean - dev * std
+    m = min(start + n, window)
+    last = x[-m:]
+    state[_BB_RING + np.arange(start + n - m, start + n) % window] = last
+    state[_BB_SUM] = last.sum()
+    state[_BB_SUMSQ] = (last * last).sum()
+    return high, low
+
+
+if not HAVE_NUMBA:
+    _bb_loop = _bb_convolve
+
+
+# Feed new closes through all indicators, updating state in place. Returns the
+# indicator values for just the new bars.
+@njit(cache=True)
+def _advance(state, close, rsi_period, macd_fast, macd_slow, macd_signal, bb_window, bb_dev):
+    start = int(state[_N])
+    rsi = _rsi_loop(close, rsi_period, state, start)
+    macd, signal = _macd_loop(close, macd_fast, macd_slow, macd_signal, state, start)
+    bb_high, bb_low = _bb_loop(close, bb_window, bb_dev, state, start)
+    state[_N] = start + close.shape[0]
+    return rsi, macd, signal, bb_high, bb_low
@@ -1,117 +1,331 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import yfinance as yf
-from ta.momentum import RSIIndicator
-from ta.trend import MACD
-from ta.volatility import BollingerBands
-import plotly.graph_objects as go
+import requests
+from streamlit_autorefresh import st_autorefresh
 import time
+import os
+import pickle
+from pathlib import Path
+from urllib.parse import quote
+from indicators import new_state
+try:
+    # Ahead-of-time compiled by build_kernels.py, so a cold start skips the JIT compile
+    from stock_kernels import advance as _advance
+except ImportError:
+    from indicators import _advance
 
 # Set page config as the first Streamlit command
 st.set_page_config(page_title="Stock Signal Dashboard", layout="wide")
 
-# Cache stock data to reduce API calls
+# On-disk cache so fetched bars survive worker restarts and are shared across sessions
+CACHE_DIR = Path(".cache")
+INTERVAL_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400, "1h": 3600, "1d": 86400}
+
+# Index of the current bar; cache entries are valid until the next bar starts
+def bar_bucket(interval):
+    return int(time.time() // INTERVAL_SECONDS.get(interval, 300))
+
+# The symbol is user input: percent-encode it, dots included, so names like ".."
+# or "a/b" always map to a single directory inside CACHE_DIR
+def cache_path(symbol, period, interval):
+    name = quote(symbol, safe="").replace(".", "%2E") or "%00"
+    return CACHE_DIR / name / f"{period}_{interval}.pkl"
+
+def read_cached_data(symbol, period, interval):
+    path = cache_path(symbol, period, interval)
+    try:
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        entry = None
+    # A file that can't be unpickled (e.g. written by another pandas version) or has an
+    # unexpected payload is a miss; drop it so it gets rewritten by the next fetch
+    if not isinstance(entry, dict) or not isinstance(entry.get("df"), pd.DataFrame):
+        try:
+            path.unlink()
+        except OSError:
+            pass
+        return None
+    if entry.get("bucket") != bar_bucket(interval):
+        return None
+    return entry["df"]
+
+def write_cached_data(symbol, period, interval, df):
+    path = cache_path(symbol, period, interval)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"bucket": bar_bucket(interval), "df": df}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
+YAHOO_SPARK_URL = "https://query1.finance.yahoo.com/v7/finance/spark"
+SPARK_MAX_SYMBOLS = 20
+
+# One keep-alive session for all Yahoo requests across reruns
+@st.cache_resource
+def get_yahoo_session():
+    session = requests.Session()
+    session.headers.update({"User-Agent": "Mozilla/5.0"})
+    return session
+
+# Chart JSON per symbol. A single symbol uses the chart endpoint; several are
+# fetched together through the spark endpoint, one round-trip per 20 symbols.
+def fetch_charts(symbols, period, interval):
+    session = get_yahoo_session()
+    params = {"interval": interval, "range": period}
+    if len(symbols) == 1:
+        # The symbol is user input; encode it so it can't add a query string or path
+        # segments. "." and ".." survive quoting and would be resolved as dot segments.
+        if symbols[0] in (".", ".."):
+            return {}
+        url = YAHOO_CHART_URL.format(symbol=quote(symbols[0], safe=""))
+        response = session.get(url, params=params, timeout=5)
+        result = response.json()["chart"]["result"]
+        return {symbols[0]: result[0]} if result else {}
+    charts = {}
+    for i in range(0, len(symbols), SPARK_MAX_SYMBOLS):
+        chunk = symbols[i:i + SPARK_MAX_SYMBOLS]
+        response = session.get(YAHOO_SPARK_URL, params={**params, "symbols": ",".join(chunk)}, timeout=5)
+        for item in response.json()["spark"]["result"] or []:
+            if item.get("response"):
+                charts[item["symbol"]] = item["response"][0]
+    return charts
+
+def chart_to_frame(chart):
+    # Read the close series straight from the JSON arrays; missing bars come back as null -> NaN.
+    # float32 is ample for 2dp prices and halves the memory the indicator loops stream through.
+    close = np.asarray(chart["indicators"]["quote"][0]["close"], dtype=np.float32)
+    ts = pd.to_datetime(chart["timestamp"], unit="s", utc=True)
+    tz = chart["meta"].get("exchangeTimezoneName")
+    if tz:
+        ts = ts.tz_convert(tz)
+    return pd.DataFrame({"Datetime": ts, "Close": close}).dropna().reset_index(drop=True)
+
+# Cache stock data for a whole watchlist at once; bucket keys the entry to the current bar.
+# Failed symbols get an empty frame and an entry in the returned errors dict; nothing
+# is shown from here, so a bad watchlist symbol doesn't put a banner on the page.
 @st.cache_data(ttl=300)
-def get_stock_data(symbol, period="1d", interval="5m"):
+def get_stock_data_batch(symbols, period="1d", interval="5m", bucket=None):
+    frames = {}
+    errors = {}
+    for symbol in symbols:
+        cached = read_cached_data(symbol, period, interval)
+        if cached is not None:
+            frames[symbol] = cached
+    missing = [symbol for symbol in symbols if symbol not in frames]
+    if not missing:
+        return frames, errors
     try:
-        df = yf.download(symbol, period=period, interval=interval, progress=False)
-        if df.empty:
-            st.error(f"No data found for {symbol}. Please check the symbol.")
-            return pd.DataFrame()
-        df = df.reset_index()
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = [col[0] for col in df.columns]
-        if 'Date' in df.columns:
-            df.rename(columns={'Date': 'Datetime'}, inplace=True)
-        df['Close'] = pd.to_numeric(df['Close'], errors='coerce')
-        if df['Close'].isna().all():
-            st.error(f"Invalid Close data for {symbol}.")
-            return pd.DataFrame()
-        return df
+        charts = fetch_charts(missing, period, interval)
     except Exception as e:
-        st.error(f"Error fetching data for {symbol}: {str(e)}")
-        return pd.DataFrame()
+        charts = None
+        fetch_error = str(e)
+    for symbol in missing:
+        frames[symbol] = pd.DataFrame()
+        if charts is None:
+            errors[symbol] = f"Error fetching data for {symbol}: {fetch_error}"
+            continue
+        chart = charts.get(symbol)
+        if not chart or "timestamp" not in chart:
+            errors[symbol] = f"No data found for {symbol}. Please check the symbol."
+            continue
+        try:
+            df = chart_to_frame(chart)
+        except Exception as e:
+            errors[symbol] = f"Error fetching data for {symbol}: {str(e)}"
+            continue
+        if df.empty:
+            errors[symbol] = f"Invalid Close data for {symbol}."
+            continue
+        write_cached_data(symbol, period, interval, df)
+        frames[symbol] = df
+    return frames, errors
+
+# The displayed symbol is fetched together with the watchlist, so switching
+# between watchlist symbols hits the same cache entry
+def get_stock_data(symbol, period="1d", interval="5m", bucket=None, watchlist=()):
+    symbols = tuple(sorted(set(watchlist) | {symbol}))
+    frames, errors = get_stock_data_batch(symbols, period, interval, bucket)
+    if symbol in errors:
+        st.error(errors[symbol])
+    return frames[symbol]
+
+BB_WINDOW = 20
+BB_DEV = 2.0
 
-def compute_signals(df, rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9):
+# Full pass over a run of closed bars. Cached across sessions on the raw close bytes,
+# so a new session, or one that just changed settings back, reuses earlier work.
+@st.cache_data(max_entries=32)
+def _compute_signals_cached(close_bytes, params):
+    close = np.frombuffer(close_bytes, dtype=np.float32)
+    state = new_state(BB_WINDOW)
+    columns = _advance(state, close, *params, BB_WINDOW, BB_DEV)
+    return columns, state
+
+# Indicator state is kept per symbol in the session. Every bar but the last is
+# closed, so it is folded into the state once; the last bar is still forming and
+# is evaluated on a copy of the state on each refresh.
+def update_indicators(symbol, ts, close, params):
+    key = f"ind_{symbol}"
+    entry = st.session_state.get(key)
+    n = len(close)
+    count = entry["count"] if entry is not None else 0
+    # Start over when the settings change, the window rolls over or a closed bar was revised
+    if not (
+        entry is not None
+        and entry["params"] == params
+        and entry["first_ts"] == ts[0]
+        and 0 < count <= n - 1
+        and entry["last_ts"] == ts[count - 1]
+        and entry["last_close"] == close[count - 1]
+    ):
+        columns, state = _compute_signals_cached(close[:n - 1].tobytes(), params)
+        entry = {"params": params, "first_ts": ts[0], "state": state, "columns": columns}
+    elif count < n - 1:
+        new = _advance(entry["state"], close[count:n - 1], *params, BB_WINDOW, BB_DEV)
+        entry["columns"] = tuple(np.concatenate((col, part)) for col, part in zip(entry["columns"], new))
+    entry["count"] = n - 1
+    if n > 1:
+        entry["last_ts"] = ts[n - 2]
+        entry["last_close"] = close[n - 2]
+    st.session_state[key] = entry
+    tail = _advance(entry["state"].copy(), close[n - 1:], *params, BB_WINDOW, BB_DEV)
+    return tuple(np.concatenate((col, part)) for col, part in zip(entry["columns"], tail))
+
+def compute_signals(df, symbol, rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9):
+    signals = {"buy": False, "sell": False}
+    # Frames from get_stock_data already hold float closes; only coerce anything else
+    if "Close" in df.columns and df["Close"].dtype.kind != "f":
+        df = df.assign(Close=pd.to_numeric(df["Close"], errors="coerce"))
     if "Close" not in df.columns or df["Close"].isna().all():
         st.error("Close column missing or invalid.")
-        return df
+        return df, signals
     df = df.dropna(subset=["Close"])
     if df.empty:
         st.error("No valid data after dropping NaNs.")
-        return df
+        return df, signals
     try:
-        rsi = RSIIndicator(df["Close"], window=rsi_period)
-        macd = MACD(df["Close"], window_fast=macd_fast, window_slow=macd_slow, window_sign=macd_signal)
-        bb = BollingerBands(df["Close"])
-        df["RSI"] = rsi.rsi()
-        df["MACD"] = macd.macd()
-        df["Signal"] = macd.macd_signal()
-        df["BB_High"] = bb.bollinger_hband()
-        df["BB_Low"] = bb.bollinger_lband()
-        df["Buy_Signal"] = (df["MACD"] > df["Signal"]) & (df["RSI"] < 30) & (df["Close"] < df["BB_Low"])
-        df["Sell_Signal"] = (df["MACD"] < df["Signal"]) & (df["RSI"] > 70) & (df["Close"] > df["BB_High"])
+        close = df["Close"].to_numpy(dtype=np.float32)
+        ts = df["Datetime"].to_numpy(dtype="datetime64[ns]")
+        params = (rsi_period, macd_fast, macd_slow, macd_signal)
+        rsi, macd, signal, bb_high, bb_low = update_indicators(symbol, ts, close, params)
+        df["RSI"] = rsi
+        df["MACD"] = macd
+        df["Signal"] = signal
+        df["BB_High"] = bb_high
+        df["BB_Low"] = bb_low
+        # Only the latest bar drives the signal, so compare scalars instead of whole columns
+        signals["buy"] = bool(macd[-1] > signal[-1] and rsi[-1] < 30 and close[-1] < bb_low[-1])
+        signals["sell"] = bool(macd[-1] < signal[-1] and rsi[-1] > 70 and close[-1] > bb_high[-1])
     except Exception as e:
         st.error(f"Error computing indicators: {str(e)}")
+    return df, signals
+
+# Full signal columns, only built for the rows that are actually displayed
+def add_signal_columns(df):
+    df = df.copy()
+    # Compare the underlying arrays so no index alignment happens on read or write
+    close = df["Close"].to_numpy()
+    rsi = df["RSI"].to_numpy()
+    macd = df["MACD"].to_numpy()
+    signal = df["Signal"].to_numpy()
+    df["Buy_Signal"] = (macd > signal) & (rsi < 30) & (close < df["BB_Low"].to_numpy())
+    df["Sell_Signal"] = (macd < signal) & (rsi > 70) & (close > df["BB_High"].to_numpy())
     return df
 
+# Defer importing plotly until a figure is first built, so runs without data never
+# load it. Repeat calls are cheap because the module is cached in sys.modules; note
+# that st.plotly_chart imports plotly itself whenever there is data to chart.
+def _get_plotly():
+    import plotly.graph_objects as go
+    return go
+
+# Figures are built once per (symbol, theme); refreshes only swap in the new x/y arrays
 def plot_stock_data(data, symbol):
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=data["Datetime"], y=data["Close"], mode="lines", name="Close", line=dict(color="blue")))
-    fig.add_trace(go.Scatter(x=data["Datetime"], y=data["BB_High"], mode="lines", name="Bollinger High", line=dict(color="green", dash="dash")))
-    fig.add_trace(go.Scatter(x=data["Datetime"], y=data["BB_Low"], mode="lines", name="Bollinger Low", line=dict(color="red", dash="dash")))
-    fig.update_layout(
-        title=f"Stock Price and Bollinger Bands for {symbol.upper()}",
-        xaxis_title="Time",
-        yaxis_title="Price",
-        template="plotly_dark" if st.session_state.theme == "Dark" else "plotly_white",
-        height=500
-    )
+    figs = st.session_state.setdefault("_figs", {})
+    key = (symbol, st.session_state.theme)
+    fig = figs.get(key)
+    if fig is None:
+        go = _get_plotly()
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(mode="lines", name="Close", line=dict(color="blue")))
+        fig.add_trace(go.Scatter(mode="lines", name="Bollinger High", line=dict(color="green", dash="dash")))
+        fig.add_trace(go.Scatter(mode="lines", name="Bollinger Low", line=dict(color="red", dash="dash")))
+        fig.update_layout(
+            title=f"Stock Price and Bollinger Bands for {symbol.upper()}",
+            xaxis_title="Time",
+            yaxis_title="Price",
+            template="plotly_dark" if st.session_state.theme == "Dark" else "plotly_white",
+            height=500,
+            # Keep the user's zoom/pan across refreshes of the same symbol
+            uirevision=symbol,
+        )
+        figs[key] = fig
+    # plotly's JSON encoder writes float32 values as their full float64 repr
+    # (180.50999450683594), so hand it float64 rounded to the 2dp shown on screen
+    dt = data["Datetime"]
+    with fig.batch_update():
+        fig.data[0].x, fig.data[0].y = dt, data["Close"].to_numpy(dtype=np.float64).round(2)
+        fig.data[1].x, fig.data[1].y = dt, data["BB_High"].to_numpy(dtype=np.float64).round(2)
+        fig.data[2].x, fig.data[2].y = dt, data["BB_Low"].to_numpy(dtype=np.float64).round(2)
     st.plotly_chart(fig, use_container_width=True)
 
 # Initialize session state
 if "theme" not in st.session_state:
     st.session_state.theme = "Light"
 
-# Sidebar settings
+# Sidebar settings; widget values only reach the script when the form is applied
 with st.sidebar:
     st.header("Settings")
-    symbol = st.text_input("Stock Symbol (e.g., AAPL, RELIANCE.NS):", "AAPL").upper()
-    refresh_interval = st.slider("Refresh Interval (seconds):", 10, 300, 60)
-    rsi_period = st.slider("RSI Period:", 5, 50, 14)
-    macd_fast = st.slider("MACD Fast Period:", 5, 50, 12)
-    macd_slow = st.slider("MACD Slow Period:", 10, 100, 26)
-    macd_signal = st.slider("MACD Signal Period:", 5, 50, 9)
-    theme = st.selectbox("Theme", ["Light", "Dark"], index=0 if st.session_state.theme == "Light" else 1)
-    st.session_state.theme = theme
+    with st.form("settings"):
+        symbol = st.text_input("Stock Symbol (e.g., AAPL, RELIANCE.NS):", "AAPL").upper()
+        watchlist = st.text_input("Watchlist (comma-separated, fetched together):", "")
+        watchlist = tuple(s.strip().upper() for s in watchlist.split(",") if s.strip())
+        refresh_interval = st.slider("Refresh Interval (seconds):", 10, 300, 60)
+        rsi_period = st.slider("RSI Period:", 5, 50, 14)
+        macd_fast = st.slider("MACD Fast Period:", 5, 50, 12)
+        macd_slow = st.slider("MACD Slow Period:", 10, 100, 26)
+        macd_signal = st.slider("MACD Signal Period:", 5, 50, 9)
+        theme = st.selectbox("Theme", ["Light", "Dark"], index=0 if st.session_state.theme == "Light" else 1)
+        st.session_state.theme = theme
+        st.form_submit_button("Apply")
 
 # Main dashboard
 st.title("📈 Live Stock Signal Dashboard")
-placeholder = st.empty()
-
-while True:
-    with placeholder.container():
-        data = get_stock_data(symbol)
-        if not data.empty:
-            data = compute_signals(data, rsi_period, macd_fast, macd_slow, macd_signal)
-            if not data.empty and "Close" in data.columns:
-                latest = data.iloc[-1]
-                st.subheader(f"Live Signals for {symbol}")
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Current Price", f"${latest['Close']:.2f}")
-                with col2:
-                    st.metric("RSI", f"{latest['RSI']:.2f}")
-                with col3:
-                    st.metric("MACD", f"{latest['MACD']:.2f}")
-                plot_stock_data(data, symbol)
-                if latest["Buy_Signal"]:
-                    st.success("✅ Buy Signal Detected!")
-                elif latest["Sell_Signal"]:
-                    st.error("🔻 Sell Signal Detected!")
-                else:
-                    st.info("🔍 No strong signal currently.")
-                with st.expander("📊 Recent Data"):
-                    st.dataframe(data.tail(10).style.format({"Close": "{:.2f}", "RSI": "{:.2f}", "MACD": "{:.2f}", "Signal": "{:.2f}", "BB_High": "{:.2f}", "BB_Low": "{:.2f}"}))
-        time.sleep(refresh_interval)
-        st.rerun()
+# Rerun the script on a timer instead of sleeping in a loop
+st_autorefresh(interval=refresh_interval * 1000, key="tick")
+
+data = get_stock_data(symbol, bucket=bar_bucket("5m"), watchlist=watchlist)
+if not data.empty:
+    data, signals = compute_signals(data, symbol, rsi_period, macd_fast, macd_slow, macd_signal)
+    if not data.empty and "Close" in data.columns:
+        # Read the last values straight from the column arrays instead of building a row Series
+        latest = {col: data[col].to_numpy()[-1] for col in ("Close", "RSI", "MACD")}
+        st.subheader(f"Live Signals for {symbol}")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Current Price", f"${latest['Close']:.2f}")
+        with col2:
+            st.metric("RSI", f"{latest['RSI']:.2f}")
+        with col3:
+            st.metric("MACD", f"{latest['MACD']:.2f}")
+        plot_stock_data(data, symbol)
+        if signals["buy"]:
+            st.success("✅ Buy Signal Detected!")
+        elif signals["sell"]:
+            st.error("🔻 Sell Signal Detected!")
+        else:
+            st.info("🔍 No strong signal currently.")
+        with st.expander("📊 Recent Data"):
+            # Pre-format the few displayed cells instead of going through pandas Styler
+            recent = add_signal_columns(data.tail(10))
+            for col in ["Close", "RSI", "MACD", "Signal", "BB_High", "BB_Low"]:
+                recent[col] = recent[col].map("{:.2f}".format)
+            st.dataframe(recent)